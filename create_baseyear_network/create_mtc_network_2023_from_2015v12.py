@@ -10,6 +10,7 @@ References:
   * MTC Year 2023 Network Creation Steps Google Doc (https://docs.google.com/document/d/1TU0nsUHmyKfYZDbwjeCFiW09w53fyWu7X3XcRlNyf2o/edit?tab=t.0#heading=h.kt1d1r2i57ei)
   * https://github.com/Metropolitan-Council/met_council_wrangler/blob/main/notebooks
 """
+import concurrent.futures
 import datetime, time
 import getpass
 import pathlib
@@ -18,6 +19,11 @@ import typing
 import pandas as pd
 import numpy as np
 import geopandas as gpd
+import pyarrow
+import pyarrow.compute
+import pyarrow.csv
+import pyarrow.parquet
+import pyproj
 import shapely.geometry
 
 import tableau_utils
@@ -55,74 +61,78 @@ SHAPES_FILE = INPUT_2015v12 / "v12_shape.geojson"
 
 NOW = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
-def create_line(row):
-  """Simple method to create shapely.geometry.LineString from coordinates in a DataFrame row
-  """
-  start_point = shapely.geometry.Point(row['X_A'], row['Y_A'])
-  end_point = shapely.geometry.Point(row['X_B'], row['Y_B'])
-  return shapely.geometry.LineString([start_point, end_point])
+# File format for the output transit network. Parquet is much faster to write and re-read
+# than csv; set to "csv" for human-readable output when debugging
+TRANSIT_NETWORK_FILE_FORMAT = "parquet"
+
+# Id and flag columns of the roadway parquet files to store with the smallest integer type that holds their values.
+# network_wrangler coerces them back to int64 when the files are reloaded
+DOWNCAST_INTEGER_COLUMNS = ['A', 'B', 'model_node_id', 'model_link_id', 'managed', 'shape_id_int']
 
-def fix_link_lanes(road_links_gdf: pd.DataFrame, lanes_col: str):
+def fix_link_lanes(road_links_gdf: pd.DataFrame, lanes_cols: typing.List[str]):
   """Makes lanes columns network_wrangler 1.0 compliant.
 
-  Updates the given column so that it only contains integers, and scoped values are set into sc_[lanes_col]
+  Updates the given columns so that they only contain integers, and scoped values are set into sc_[lanes_col]
   Args:
       links_df (pd.DataFrame): the RoadLinks DataFrame
-      lanes_col (str): 'lanes' or 'ML_lanes'
+      lanes_cols (List[str]): the lanes columns to fix, e.g. ['lanes', 'ML_lanes']
   """
-  lanes_dict_list = road_links_gdf.loc[road_links_gdf[lanes_col].apply(lambda x: isinstance(x, dict)), lanes_col].to_list()
-  # Make the dictionaries unique by converting to string representations, getting unique ones, then converting back
-  unique_lanes_dict_list = []
-  seen_dicts = set()
-  for lanes_dict in lanes_dict_list:
-    dict_str = str(sorted(lanes_dict.items()))
-    if dict_str not in seen_dicts:
-      seen_dicts.add(dict_str)
-      unique_lanes_dict_list.append(lanes_dict)
-  lanes_dict_list = unique_lanes_dict_list
-
-  WranglerLogger.debug(f"fix_link_lanes(lanes_col={lanes_col})")
-  WranglerLogger.debug(f"{len(lanes_dict_list)=}  lanes_dict_list:{lanes_dict_list}")
-  # lanes_dict_list: [
-  # {'default': 3, 'timeofday': [{'time': [21600, 36000], 'value': 2}, {'time': [54000, 68400], 'value': 2}]}, 
-  # {'default': 3, 'timeofday': [{'time': [54000, 68400], 'value': 2}]}, 
-  # {'default': 3, 'timeofday': [{'time': [21600, 36000], 'value': 2}]}, 
-  # etc
-  for lanes_dict in lanes_dict_list:
-    WranglerLogger.debug(f"  lanes_dict: {lanes_dict}")
-    # create sc_lanes from this dictionary
-    # network_wrangler/api_roadway/#network_wrangler.models.roadway.tables.RoadLinksTable
-    sc_lanes = None
-    if ('timeofday' in lanes_dict) and (len(lanes_dict['timeofday'])>0):
-      sc_lanes = []
-      for my_dict in lanes_dict['timeofday']:
-        sc_dict = {}
-        sc_dict['timespan'] = [
-          time.strftime("%H:%M", time.gmtime(my_dict['time'][0])),
-          time.strftime("%H:%M", time.gmtime(my_dict['time'][1]))
-        ]
-        sc_dict['value'] = my_dict['value']
-        sc_lanes.append(sc_dict)
-        # e.g. [{'timespan':['12:00':'15:00'], 'value': 3},{'timespan':['15:00':'19:00'], 'value': 2}]
-    # set them
-    road_links_gdf.loc[ road_links_gdf[lanes_col]==lanes_dict, lanes_col] = lanes_dict['default']
-    # since sc_lanes may be a dictionary, make copies of it for each row to set or
-    # pandas will error that the length doesn't match the rows
-    road_links_gdf.loc[ road_links_gdf[lanes_col]==lanes_dict, f'sc_{lanes_col}'] = [sc_lanes] * len(road_links_gdf[road_links_gdf[lanes_col] == lanes_dict])
-
-  # Set null, blank, '0' or 'NaN' to 0
-  road_links_gdf.loc[ road_links_gdf[lanes_col].isnull(), lanes_col ] = 0
-  road_links_gdf.loc[ road_links_gdf[lanes_col] == '',    lanes_col ] = 0
-  road_links_gdf.loc[ road_links_gdf[lanes_col] == '0',   lanes_col ] = 0
-  road_links_gdf.loc[ road_links_gdf[lanes_col] == 'NaN', lanes_col ] = 0
-
-  # reset and check
-  road_links_gdf[f'{lanes_col}_type'] = road_links_gdf[lanes_col].apply(type).astype(str)
-  WranglerLogger.debug(f"road_links_gdf[['{lanes_col}_type]']].value_counts():")
-  WranglerLogger.debug(road_links_gdf[[f'{lanes_col}_type']].value_counts())
-
-  WranglerLogger.debug(f"strings value_counts():")
-  WranglerLogger.debug(road_links_gdf.loc[ road_links_gdf[lanes_col].apply(lambda x: isinstance(x, str)), lanes_col])
+  # classify the value types for all the lanes columns in a single pass
+  lanes_types_df = road_links_gdf[lanes_cols].map(type)
+
+  for lanes_col in lanes_cols:
+    is_lanes_dict = (lanes_types_df[lanes_col] == dict).to_numpy()
+    lanes_dict_series = road_links_gdf.loc[is_lanes_dict, lanes_col]
+    # Key the dictionaries by their string representations, so each unique one is converted once
+    lanes_dict_keys = lanes_dict_series.map(lambda lanes_dict: str(sorted(lanes_dict.items())))
+    # and find the first row for each unique key using pandas' hash table
+    is_first_key = ~lanes_dict_keys.duplicated().to_numpy()
+    unique_lanes_dicts = lanes_dict_series.to_numpy()[is_first_key]
+    # Format each distinct time of day boundary (seconds after midnight) as HH:MM just once
+    timeofday_seconds = {
+      seconds for lanes_dict in unique_lanes_dicts for my_dict in lanes_dict.get('timeofday', []) for seconds in my_dict['time']
+    }
+    hhmm_by_seconds = {seconds: time.strftime("%H:%M", time.gmtime(seconds)) for seconds in timeofday_seconds}
+    lanes_default_by_key = {}
+    sc_lanes_by_key = {}
+    for dict_key, lanes_dict in zip(lanes_dict_keys.to_numpy()[is_first_key], unique_lanes_dicts):
+      # create sc_lanes from this dictionary
+      # network_wrangler/api_roadway/#network_wrangler.models.roadway.tables.RoadLinksTable
+      sc_lanes = None
+      if ('timeofday' in lanes_dict) and (len(lanes_dict['timeofday'])>0):
+        sc_lanes = []
+        for my_dict in lanes_dict['timeofday']:
+          sc_dict = {}
+          sc_dict['timespan'] = [hhmm_by_seconds[my_dict['time'][0]], hhmm_by_seconds[my_dict['time'][1]]]
+          sc_dict['value'] = my_dict['value']
+          sc_lanes.append(sc_dict)
+          # e.g. [{'timespan':['12:00':'15:00'], 'value': 3},{'timespan':['15:00':'19:00'], 'value': 2}]
+      lanes_default_by_key[dict_key] = lanes_dict['default']
+      sc_lanes_by_key[dict_key] = sc_lanes
+
+    WranglerLogger.debug(f"fix_link_lanes(lanes_col={lanes_col})")
+    WranglerLogger.debug(f"{len(lanes_default_by_key)=}  unique lanes dicts:{list(lanes_default_by_key.keys())}")
+    # unique lanes dicts: [
+    # {'default': 3, 'timeofday': [{'time': [21600, 36000], 'value': 2}, {'time': [54000, 68400], 'value': 2}]}, 
+    # {'default': 3, 'timeofday': [{'time': [54000, 68400], 'value': 2}]}, 
+    # {'default': 3, 'timeofday': [{'time': [21600, 36000], 'value': 2}]}, 
+    # etc
+
+    # set them, mapping every dictionary row at once
+    road_links_gdf.loc[is_lanes_dict, lanes_col] = lanes_dict_keys.map(lanes_default_by_key).to_numpy()
+    # The time of day values go into sc_[lanes_col] as lists of scoped value dicts; None for the other rows.
+    if is_lanes_dict.any():
+      sc_lanes_values = np.full(len(road_links_gdf), None, dtype=object)
+      sc_lanes_values[is_lanes_dict] = lanes_dict_keys.map(sc_lanes_by_key).to_numpy()
+      road_links_gdf[f'sc_{lanes_col}'] = sc_lanes_values
+
+    # Set null, blank, '0' or 'NaN' to 0
+    road_links_gdf.loc[ road_links_gdf[lanes_col].isnull() | road_links_gdf[lanes_col].isin(['', '0', 'NaN']), lanes_col ] = 0
+
+    # check the resulting types, without adding a type column to the links
+    lanes_types = road_links_gdf[lanes_col].map(type)
+    WranglerLogger.debug(f"road_links_gdf['{lanes_col}'] types value_counts():\n{lanes_types.value_counts()}")
+    WranglerLogger.debug(f"strings:\n{road_links_gdf.loc[ lanes_types == str, lanes_col]}")
 
 def fix_mixed_type_columns(road_links_gdf: pd.DataFrame):
   """Fix columns with mixed types that prevent parquet writing.
@@ -134,11 +144,7 @@ def fix_mixed_type_columns(road_links_gdf: pd.DataFrame):
   for col in road_links_gdf.columns:
     if road_links_gdf[col].dtype == 'object':
       # Check if column has mixed types
-      types_in_col = set()
-      sample_size = min(1000, len(road_links_gdf))
-      for val in road_links_gdf[col].head(sample_size):
-        if pd.notna(val):
-          types_in_col.add(type(val).__name__)
+      types_in_col = {val_type.__name__ for val_type in road_links_gdf[col].head(1000).dropna().map(type).unique()}
       
       if len(types_in_col) > 1:
         WranglerLogger.debug(f"  Column {col} has mixed types: {types_in_col}. Converting to string.")
@@ -157,6 +163,9 @@ def fix_numeric_columns(road_links_gdf: pd.DataFrame):
   numeric_cols = []
   
   for col in road_links_gdf.columns:
+    # Scoped value columns (e.g. sc_lanes) are lists of dicts, not numbers
+    if col.startswith('sc_'):
+      continue
     # Check if column name suggests it should be numeric
     if any(suffix in col.lower() for suffix in numeric_suffixes):
       numeric_cols.append(col)
@@ -170,7 +179,6 @@ def fix_numeric_columns(road_links_gdf: pd.DataFrame):
       if len(sample) > 0:
         try:
           # Try to convert a sample to numeric
-          pd.to_numeric(sample, errors='coerce')
           # If more than 50% convert successfully, consider it numeric
           converted = pd.to_numeric(sample, errors='coerce')
           if converted.notna().sum() / len(sample) > 0.5:
@@ -182,11 +190,8 @@ def fix_numeric_columns(road_links_gdf: pd.DataFrame):
   
   for col in numeric_cols:
     if col in road_links_gdf.columns:
-      # Replace empty strings and string NaN values with np.nan
-      road_links_gdf[col] = road_links_gdf[col].replace('', np.nan)
-      road_links_gdf[col] = road_links_gdf[col].replace('nan', np.nan)
-      road_links_gdf[col] = road_links_gdf[col].replace('NaN', np.nan)
-      road_links_gdf[col] = road_links_gdf[col].replace('NAN', np.nan)
+      # Replace empty strings and string NaN values with np.nan in a single pass over the column
+      road_links_gdf[col] = road_links_gdf[col].replace(['', 'nan', 'NaN', 'NAN'], np.nan)
       
       # Try to convert to numeric
       try:
@@ -212,7 +217,7 @@ def fix_link_access(road_links_gdf: pd.DataFrame, access_col: str):
     return
     
   WranglerLogger.debug(f"fix_link_access(access_col='{access_col}')")
-  col_type = road_links_gdf[access_col].apply(type).astype(str)
+  col_type = road_links_gdf[access_col].map(type)
   WranglerLogger.debug(f"col_type.value_counts(dropna=False):\n{col_type.value_counts(dropna=False)}")
   # convert to string
   road_links_gdf[access_col] = road_links_gdf[access_col].astype(str)
@@ -220,10 +225,89 @@ def fix_link_access(road_links_gdf: pd.DataFrame, access_col: str):
   road_links_gdf.rename({access_col:f'orig_{access_col}'}, inplace=True)
   WranglerLogger.debug(f"Converted column '{access_col}' to str and renamed to 'orig_{access_col}'")
 
+def projected_lengths(geometry: gpd.GeoSeries, crs) -> np.ndarray:
+  """Returns the lengths of the given (Multi)LineStrings in the units of the given projected crs.
+
+  Equivalent to geometry.to_crs(crs).length, but transforms the coordinate arrays directly
+  rather than constructing a projected copy of every geometry.
+
+  Args:
+      geometry (gpd.GeoSeries): (Multi)LineString geometries with a crs set
+      crs: the projected crs to measure the lengths in, e.g. 2227
+
+  Returns:
+      np.ndarray of lengths, one per geometry (0 for null or empty geometries)
+  """
+  transformer = pyproj.Transformer.from_crs(geometry.crs, crs, always_xy=True)
+  # split multi-part geometries so that segments are never measured across parts
+  parts, part_geometry_index = shapely.get_parts(np.asarray(geometry.values), return_index=True)
+  coords, coord_part_index = shapely.get_coordinates(parts, return_index=True)
+  x, y = transformer.transform(coords[:,0], coords[:,1])
+  # a segment joins consecutive coordinates of the same part
+  same_part = coord_part_index[1:] == coord_part_index[:-1]
+  segment_lengths = np.hypot(np.diff(x), np.diff(y))[same_part]
+  part_lengths = np.bincount(coord_part_index[1:][same_part], weights=segment_lengths, minlength=len(parts))
+  return np.bincount(part_geometry_index, weights=part_lengths, minlength=len(geometry))
+
+def read_geojson_with_parquet_cache(geojson_file: pathlib.Path) -> gpd.GeoDataFrame:
+  """Reads the given GeoJSON file, caching it as GeoParquet next to it for subsequent runs.
+
+  If [geojson_file].parquet exists and is newer than geojson_file, that is read instead;
+  otherwise the GeoJSON is read and the cache is (re)written. Failing to write the cache
+  (e.g. a read-only input directory) is logged and otherwise ignored.
+
+  Args:
+      geojson_file (pathlib.Path): the GeoJSON file to read
+
+  Returns:
+      gpd.GeoDataFrame read from the cache or from geojson_file
+  """
+  parquet_file = geojson_file.with_suffix(".parquet")
+  if parquet_file.exists() and parquet_file.stat().st_mtime > geojson_file.stat().st_mtime:
+    WranglerLogger.info(f"Reading cached {parquet_file}")
+    return gpd.read_parquet(parquet_file)
+
+  # pyogrio's arrow reader is much faster than per-feature reads
+  gdf = gpd.read_file(geojson_file, engine='pyogrio', use_arrow=True)
+  try:
+    gdf.to_parquet(parquet_file, compression="zstd")
+    WranglerLogger.info(f"Cached {geojson_file} as {parquet_file}")
+  except Exception as e:
+    WranglerLogger.warning(f"Could not cache {geojson_file} as {parquet_file}: {e}")
+  return gdf
+
+def downcast_integer_columns(table: pyarrow.Table, columns: typing.List[str]) -> pyarrow.Table:
+  """Casts the given int64 columns in the pyarrow Table to the smallest of int8, int16, int32 that holds their values.
+
+  Used when writing parquet files; the in-memory pandas DataFrames keep their int64 columns.
+  Columns that aren't in the table or aren't int64 are left alone.
+
+  Args:
+      table (pyarrow.Table): the table to downcast
+      columns (List[str]): the names of the columns to downcast, e.g. DOWNCAST_INTEGER_COLUMNS
+
+  Returns:
+      pyarrow.Table with the downcast columns
+  """
+  for col_idx, field in enumerate(table.schema):
+    if field.name not in columns: continue
+    if field.type != pyarrow.int64(): continue
+    min_max = pyarrow.compute.min_max(table.column(col_idx)).as_py()
+    if min_max['min'] is None: continue # all null
+
+    for int_type in [pyarrow.int8(), pyarrow.int16(), pyarrow.int32()]:
+      int_info = np.iinfo(int_type.to_pandas_dtype())
+      if (min_max['min'] >= int_info.min) and (min_max['max'] <= int_info.max):
+        WranglerLogger.debug(f"  Downcasting column {field.name} to {int_type}")
+        table = table.set_column(col_idx, field.with_type(int_type), table.column(col_idx).cast(int_type))
+        break
+  return table
+
 def create_nodes_for_new_stations(
     new_stop_ids: typing.List[str],
     gtfs_model: network_wrangler.models.gtfs.gtfs.GtfsModel,
-    nodes_gdf: gpd.GeoDataFrame
+    nodes_gdf: gpd.GeoDataFrame,
+    counties_gdf: gpd.GeoDataFrame
   ) -> gpd.GeoDataFrame:
   """Creates nodes table for a list of stop_ids in a gtfs feed.
     
@@ -234,6 +318,7 @@ def create_nodes_for_new_stations(
         new_stop_ids (List[str]): list of stop_ids
         gtfs_model (network_wrangler.models.gtfs.gtfs.GtfsModelGtfsModel): GTFS feed with stop_ids
         nodes_gdf (gpd.GeoDataFrame): Nodes table
+        counties_gdf (gpd.GeoDataFrame): County polygons (from COUNTY_SHAPEFILE) with column NAME10
         
     Returns:
         Node table with the given stop ids in the same crs as nodes_gdf. Columns:
@@ -249,9 +334,6 @@ def create_nodes_for_new_stations(
   """
   WranglerLogger.debug("=== create_nodes_for_new_stations() ====")
 
-  # Read county shapefile for spatial join
-  counties_gdf = gpd.read_file(COUNTY_SHAPEFILE)
-  
   # Map county names to county network node start based on
   # https://bayareametro.github.io/tm2py/inputs/#county-node-numbering-system
   COUNTY_NAME_TO_NODE_START_NUM = {
@@ -268,12 +350,13 @@ def create_nodes_for_new_stations(
   }
 
   # Get stop coordinates from GTFS for the new stations
-  new_stops_df = gtfs_model.stops[gtfs_model.stops['stop_id'].isin(new_stop_ids)].copy()
+  new_stops_df = gtfs_model.stops[gtfs_model.stops['stop_id'].isin(new_stop_ids)]
   
   # Create GeoDataFrame from stops
-  new_stops_geometry = [shapely.geometry.Point(lon, lat) for lon, lat in 
-                        zip(new_stops_df['stop_lon'], new_stops_df['stop_lat'])]
-  new_stops_gdf = gpd.GeoDataFrame(new_stops_df, geometry=new_stops_geometry, crs='EPSG:4326')
+  new_stops_gdf = gpd.GeoDataFrame(
+    new_stops_df,
+    geometry=gpd.points_from_xy(new_stops_df['stop_lon'], new_stops_df['stop_lat']),
+    crs='EPSG:4326')
   
   # Reproject to match county shapefile CRS if needed
   if counties_gdf.crs != new_stops_gdf.crs:
@@ -310,10 +393,8 @@ def create_nodes_for_new_stations(
       new_node_ids = generate_node_ids(nodes_gdf, range(start_range, end_range), n=num_stops)
       WranglerLogger.debug(f"new_node_ids: {new_node_ids}")
       
-      # Assign the generated node IDs to the stops
-      for i, (idx, stop_row) in enumerate(county_stops_df.iterrows()):
-        stop_id = stop_row['stop_id']
-        new_stops_gdf.loc[new_stops_gdf.stop_id == stop_id, 'model_node_id'] = new_node_ids[i]
+      # Assign the generated node IDs to this county's stops, in one assignment using the group's index
+      new_stops_gdf.loc[county_stops_df.index, 'model_node_id'] = new_node_ids
         
     except Exception as e:
       WranglerLogger.error(f"Could not generate node IDs for county {county_name}: {e}")
@@ -356,37 +437,56 @@ def create_transit_links_for_new_stations(
 
   # Get the maximum model_link_id from existing links
   max_link_id = existing_links_gdf['model_link_id'].max()
-  next_link_id = max_link_id + 1
   
-  link_dicts = []
+  # A, B and name for each link to create; the link table is built column-wise at the end
+  link_A = []
+  link_B = []
+  link_names = []
+  # (A point, B point) for each link; the geometries are created together at the end
+  link_points = []
   # Track created links to avoid duplicates within this batch
   created_links = set()
-  
-  for (from_stop_id, to_stop_id, oneway) in stop_pairs:
-    from_model_node_id = stop_id_to_model_node_id.get(from_stop_id)
-    to_model_node_id = stop_id_to_model_node_id.get(to_stop_id)
+
+  # Look up the model_node_ids for all the stop pairs at once (-1 if the stop isn't mapped)
+  # and check which of them already exist in the network in two vectorized passes
+  # rather than scanning existing_links_gdf for every pair
+  from_model_node_ids = np.fromiter(
+    (stop_id_to_model_node_id.get(from_stop_id, -1) for (from_stop_id, _, _) in stop_pairs),
+    dtype=np.int64, count=len(stop_pairs))
+  to_model_node_ids = np.fromiter(
+    (stop_id_to_model_node_id.get(to_stop_id, -1) for (_, to_stop_id, _) in stop_pairs),
+    dtype=np.int64, count=len(stop_pairs))
+  existing_links_AB = pd.MultiIndex.from_arrays([existing_links_gdf['A'].to_numpy(), existing_links_gdf['B'].to_numpy()])
+  forward_exists_array = pd.MultiIndex.from_arrays([from_model_node_ids, to_model_node_ids]).isin(existing_links_AB)
+  reverse_exists_array = pd.MultiIndex.from_arrays([to_model_node_ids, from_model_node_ids]).isin(existing_links_AB)
+  # Likewise look up the node points for all the stop pairs at once (None if the node isn't in node_gdf)
+  node_point_by_id = node_gdf.drop_duplicates(subset='model_node_id').set_index('model_node_id').geometry
+  from_points = node_point_by_id.reindex(from_model_node_ids).to_numpy()
+  to_points = node_point_by_id.reindex(to_model_node_ids).to_numpy()
+
+  for pair_idx, (from_stop_id, to_stop_id, oneway) in enumerate(stop_pairs):
+    from_model_node_id = int(from_model_node_ids[pair_idx])
+    to_model_node_id = int(to_model_node_ids[pair_idx])
     
-    if from_model_node_id is None:
+    if from_model_node_id == -1:
       WranglerLogger.warning(f"Stop {from_stop_id} not found in stop_id_to_model_node_id mapping - skipping link")
       continue
-    if to_model_node_id is None:
+    if to_model_node_id == -1:
       WranglerLogger.warning(f"Stop {to_stop_id} not found in stop_id_to_model_node_id mapping - skipping link")
       continue
     
-    point_A_series = node_gdf.loc[node_gdf.model_node_id == from_model_node_id].geometry
-    point_B_series = node_gdf.loc[node_gdf.model_node_id == to_model_node_id].geometry
+    point_A = from_points[pair_idx]
+    point_B = to_points[pair_idx]
     
-    if len(point_A_series) == 0:
+    if point_A is None:
       WranglerLogger.warning(f"Node {from_model_node_id} for stop {from_stop_id} not found in node_gdf - skipping link")
       continue
-    if len(point_B_series) == 0:
+    if point_B is None:
       WranglerLogger.warning(f"Node {to_model_node_id} for stop {to_stop_id} not found in node_gdf - skipping link")
       continue
 
     # Check if link already exists in the network
-    forward_exists = ((existing_links_gdf['A'] == from_model_node_id) & 
-                      (existing_links_gdf['B'] == to_model_node_id)).any()
-    if forward_exists:
+    if forward_exists_array[pair_idx]:
       raise ValueError(
         f"Link from node {from_model_node_id} (stop {from_stop_id}) to node {to_model_node_id} (stop {to_stop_id}) "
         f"already exists in the network. Duplicate transit links are not allowed."
@@ -402,9 +502,7 @@ def create_transit_links_for_new_stations(
     
     # For two-way links, also check if reverse link exists
     if not oneway:
-      reverse_exists = ((existing_links_gdf['A'] == to_model_node_id) & 
-                        (existing_links_gdf['B'] == from_model_node_id)).any()
-      if reverse_exists:
+      if reverse_exists_array[pair_idx]:
         raise ValueError(
           f"Reverse link from node {to_model_node_id} (stop {to_stop_id}) to node {from_model_node_id} (stop {from_stop_id}) "
           f"already exists in the network. Cannot create bidirectional link when reverse already exists."
@@ -418,70 +516,50 @@ def create_transit_links_for_new_stations(
           f"in stop_pairs list. Bidirectional links should be specified with oneway=False, not as two separate entries."
         )
     
-    # Extract the actual Point object from the GeoSeries
-    point_A = point_A_series.values[0]
-    point_B = point_B_series.values[0]
-    
-    # Create LineString and calculate distance
-    line_geom = shapely.geometry.LineString([point_A, point_B])
-    
-    # Calculate distance in miles (assuming coordinates are in feet - EPSG:2227)
-    distance_ft = line_geom.length
-    distance_miles = distance_ft / 5280.0
-    
     # Create forward link
-    forward_link = {
-      'model_link_id': next_link_id,
-      'shape_id': str(next_link_id),
-      'A': from_model_node_id,
-      'B': to_model_node_id,
-      'name': f'Transit link {from_stop_id} to {to_stop_id}',
-      'geometry': line_geom,
-      'distance': distance_miles,
-      # Set as rail-only / ferry_only link
-      'rail_only': 1,
-      'ferry_only': 1,
-      'drive_access': 0,
-      'walk_access': 0,
-      'bike_access': 0,
-      'transit': 1,
-      # Copy lane and other attributes from template
-      'lanes': 0,
-      'managed': 0,
-      'bus_only': 0,
-    }
-    link_dicts.append(forward_link)
+    link_A.append(from_model_node_id)
+    link_B.append(to_model_node_id)
+    link_names.append(f'Transit link {from_stop_id} to {to_stop_id}')
+    link_points.append((point_A, point_B))
     created_links.add(link_tuple)  # Track this link as created
-    next_link_id += 1
 
     if oneway: continue
 
     # Create backward link
-    backward_link = {
-      'model_link_id': next_link_id,
-      'shape_id': str(next_link_id),
-      'A': to_model_node_id,
-      'B': from_model_node_id,
-      'name': f'Transit link {to_stop_id} to {from_stop_id}',
-      'geometry': shapely.geometry.LineString([point_B, point_A]),
-      'distance': distance_miles,
-      # Set as rail-only/ferry-only link
-      'rail_only': 1,
-      'ferry_only': 1,
-      'drive_access': 0,
-      'walk_access': 0,
-      'bike_access': 0,
-      'transit': 1,
-      # Copy lane and other attributes from template
-      'lanes': 0,
-      'managed': 0,
-      'bus_only': 0,
-    }
-    link_dicts.append(backward_link)
+    link_A.append(to_model_node_id)
+    link_B.append(from_model_node_id)
+    link_names.append(f'Transit link {to_stop_id} to {from_stop_id}')
+    link_points.append((point_B, point_A))
     created_links.add(reverse_tuple)  # Track the reverse link as created
-    next_link_id += 1
 
-  new_links_gdf = gpd.GeoDataFrame(data=link_dicts, crs=node_gdf.crs)    
+  # Create all the LineStrings in one vectorized call from an (n links, 2 points, 2 coords) array
+  link_coords = shapely.get_coordinates(np.array(link_points, dtype=object).reshape(-1)).reshape(-1, 2, 2)
+  link_geoms = shapely.linestrings(link_coords)
+  num_links = len(link_names)
+  model_link_ids = np.arange(max_link_id + 1, max_link_id + 1 + num_links, dtype=np.int64)
+  new_links_gdf = gpd.GeoDataFrame(
+    data={
+      'model_link_id': model_link_ids,
+      'shape_id': model_link_ids.astype(str),
+      'A': np.array(link_A, dtype=np.int64),
+      'B': np.array(link_B, dtype=np.int64),
+      'name': link_names,
+      # Set as rail-only / ferry_only link
+      'rail_only': np.ones(num_links, dtype=np.int64),
+      'ferry_only': np.ones(num_links, dtype=np.int64),
+      'drive_access': np.zeros(num_links, dtype=np.int64),
+      'walk_access': np.zeros(num_links, dtype=np.int64),
+      'bike_access': np.zeros(num_links, dtype=np.int64),
+      'transit': np.ones(num_links, dtype=np.int64),
+      # Copy lane and other attributes from template
+      'lanes': np.zeros(num_links, dtype=np.int64),
+      'managed': np.zeros(num_links, dtype=np.int64),
+      'bus_only': np.zeros(num_links, dtype=np.int64),
+    },
+    geometry=link_geoms,
+    crs=node_gdf.crs)
+  # Calculate distance in miles (assuming coordinates are in feet - EPSG:2227)
+  new_links_gdf['distance'] = shapely.length(link_geoms) / 5280.0
   WranglerLogger.debug(f"new_links_gdf:\n{new_links_gdf}")
   return new_links_gdf
 
@@ -535,7 +613,7 @@ if __name__ == "__main__":
     WranglerLogger.error(e)
 
   if not roadway_network or not gtfs_model:
-    nodes_gdf = network_wrangler.utils.io_table.read_table(filename=NODES_FILE)
+    nodes_gdf = read_geojson_with_parquet_cache(NODES_FILE)
     WranglerLogger.debug(f"Read {NODES_FILE}:\n{nodes_gdf}")
     WranglerLogger.debug(f"type(nodes_gdf)={type(nodes_gdf)} crs={nodes_gdf.crs}")
     WranglerLogger.debug(f"nodes_df.dtypes:\n{nodes_gdf.dtypes:}")
@@ -545,7 +623,7 @@ if __name__ == "__main__":
     WranglerLogger.debug(f"type(links_df)={type(links_df)}")
     WranglerLogger.debug(f"links_df.dtypes:\n{links_df.dtypes:}")
 
-    shapes_gdf = network_wrangler.utils.io_table.read_table(filename=SHAPES_FILE)
+    shapes_gdf = read_geojson_with_parquet_cache(SHAPES_FILE)
     WranglerLogger.debug(f"Read {SHAPES_FILE}:\n{shapes_gdf}")
     WranglerLogger.debug(f"type(shapes_gdf)={type(shapes_gdf)} crs={shapes_gdf.crs}")
     WranglerLogger.debug(f"shapes_df.dtypes:\n{shapes_gdf.dtypes:}")
@@ -564,9 +642,7 @@ if __name__ == "__main__":
 
     # filter out tap, taz, maz links
     WranglerLogger.debug(f"road_links_df.roadway.value_counts(dropna=False)=\n{road_links_df.roadway.value_counts(dropna=False)}")
-    road_links_df = road_links_df.loc[road_links_df.roadway != 'tap']
-    road_links_df = road_links_df.loc[road_links_df.roadway != 'taz']
-    road_links_df = road_links_df.loc[road_links_df.roadway != 'maz']
+    road_links_df = road_links_df.loc[~road_links_df.roadway.isin(['tap','taz','maz'])]
     WranglerLogger.info(f"Filtering to {len(road_links_df):,} road links after dropping roadway=tap,taz,maz")
 
     # https://bayareametro.github.io/tm2py/inputs/#county-node-numbering-system
@@ -579,102 +655,77 @@ if __name__ == "__main__":
     duplicates = road_links_df.loc[road_links_df.duplicated(subset=['id','fromIntersectionId','toIntersectionId'], keep=False)]
     WranglerLogger.debug(f"duplicated: len={len(duplicates):,}:\n{duplicates}")
 
-    road_links_df = pd.merge(
-      left=road_links_df,
-      right=shapes_gdf[['id','fromIntersectionId','toIntersectionId','geometry']],
-      on=['id','fromIntersectionId','toIntersectionId'],
-      how='left',
-      indicator=True,
-    )
-    WranglerLogger.debug(f"After merging with shapes_gdf, road_links_df[['_merge']].value_counts():\n{road_links_df[['_merge']].value_counts()}")
-    road_links_df.drop(columns=['_merge'], inplace=True)
+    # Look up each link's shape by its position in a MultiIndex of the shape key columns rather than merging;
+    # the geometries are then taken by position, and unmatched links (-1) get a null geometry
+    shape_keys_df = shapes_gdf[['id','fromIntersectionId','toIntersectionId']]
+    duplicate_shape_keys = shape_keys_df.duplicated().to_numpy()
+    if duplicate_shape_keys.any():
+      # a merge would duplicate the links matching these
+      WranglerLogger.warning(f"Ignoring {duplicate_shape_keys.sum():,} shapes with duplicate id,fromIntersectionId,toIntersectionId")
+    shape_key_index = pd.MultiIndex.from_frame(shape_keys_df.loc[~duplicate_shape_keys])
+    shape_geometry = shapes_gdf.geometry.values[~duplicate_shape_keys]
+    shape_idx = shape_key_index.get_indexer(
+      pd.MultiIndex.from_frame(road_links_df[['id','fromIntersectionId','toIntersectionId']]))
+    WranglerLogger.debug(f"Links matched to shapes: {(shape_idx >= 0).sum():,} of {len(shape_idx):,}")
+    road_links_df = road_links_df.assign(geometry=shape_geometry.take(shape_idx, allow_fill=True))
     WranglerLogger.debug(f"{len(road_links_df.geometry.isna())=:,}")
 
-    # Merging with shapes in the reverse direction
-    shapes_gdf.geometry = shapes_gdf.geometry.reverse()
-    road_links_df = pd.merge(
-      left=road_links_df,
-      right=shapes_gdf[['id','fromIntersectionId','toIntersectionId','geometry']],
-      left_on=['id','fromIntersectionId','toIntersectionId'],
-      right_on=['id','toIntersectionId', 'fromIntersectionId'],
-      how='left',
-      indicator=True,
-      suffixes=('','_revgeom')
-    )
-    WranglerLogger.debug(f"After merging with shapes_gdf (reversed), road_links_df[['_merge']].value_counts():\n{road_links_df[['_merge']].value_counts()}")
-    # now we have geometry and geometry_revgeom.  Use the latter if the former is na
-    road_links_df.loc[ road_links_df.geometry.isna(), 'geometry'] = road_links_df.geometry_revgeom
-    # drop new columns as we've used them to set geometry
-    road_links_df.drop(columns=['_merge', 'fromIntersectionId_revgeom','toIntersectionId_revgeom','geometry_revgeom'], inplace=True)
-    WranglerLogger.debug(f"{len(road_links_df.geometry.isna())=:,}")
+    # Look up shapes in the reverse direction; the matched shape geometries are reversed below,
+    # only for the links that use them
+    revgeom_shape_idx = shape_key_index.get_indexer(
+      pd.MultiIndex.from_frame(road_links_df[['id','toIntersectionId','fromIntersectionId']]))
+    WranglerLogger.debug(f"Links matched to shapes (reversed): {(revgeom_shape_idx >= 0).sum():,} of {len(revgeom_shape_idx):,}")
+    # now we have geometry and the reverse shape's position.  Use the latter (reversed) if the former is na
+    # The missing geometry mask is computed once here and reused for the links that still need geometry
+    missing_geometry = road_links_df.geometry.isna().to_numpy()
+    use_revgeom = missing_geometry & (revgeom_shape_idx >= 0)
+    # (skipping any reverse shapes without geometry)
+    use_revgeom[use_revgeom] = ~shapely.is_missing(np.asarray(shape_geometry[revgeom_shape_idx[use_revgeom]]))
+    road_links_df.loc[ use_revgeom, 'geometry'] = shapely.reverse(np.asarray(shape_geometry[revgeom_shape_idx[use_revgeom]]))
+    missing_geometry &= ~use_revgeom
+    WranglerLogger.debug(f"{missing_geometry.sum()=:,}")
 
     # For the rows that do not have geometry, create a simple two-point line geometry from the node locations
     # Use all nodes, not just road nodes
-    no_geometry_links = road_links_df.loc[ pd.isnull(road_links_df.geometry) ]
-    no_geometry_links = pd.merge(
-      left=no_geometry_links,
-      right=nodes_gdf[['model_node_id','X','Y']],
-      how='left',
-      left_on='A',
-      right_on='model_node_id',
-      validate='many_to_one',
-      indicator=True,
-      suffixes=('','_A')
-    ).rename(columns={'_merge':'_merge_A','X':'X_A','Y':'Y_A','model_node_id':'model_node_id_A'})
-
-    no_geometry_links = pd.merge(
-      left=no_geometry_links,
-      right=nodes_gdf[['model_node_id','X','Y']],
-      how='left',
-      left_on='B',
-      right_on='model_node_id',
-      validate='many_to_one',
-      indicator=True,
-      suffixes=('','_B')
-    ).rename(columns={'_merge':'_merge_B','X':'X_B','Y':'Y_B','model_node_id':'model_node_id_B'})
-
-    # check that they all merged
-    WranglerLogger.debug(f"After merging with nodes, no_geometry_links[['_merge_A','_merge_B']].value_counts():\n{no_geometry_links[['_merge_A','_merge_B']].value_counts()}")
+    no_geometry_links = road_links_df.loc[ missing_geometry ]
+    # Look up the A and B node coordinates by position in the (unique) model_node_id index rather than merging
+    # twice; get_indexer raises if model_node_id isn't unique. The extra NaN row is used for nodes not found (-1)
+    node_id_index = pd.Index(nodes_gdf['model_node_id'].to_numpy())
+    node_xy = np.vstack([nodes_gdf[['X','Y']].to_numpy(dtype=np.float64), [np.nan, np.nan]])
+    A_positions = node_id_index.get_indexer(no_geometry_links['A'].to_numpy())
+    B_positions = node_id_index.get_indexer(no_geometry_links['B'].to_numpy())
+    # check that they all matched
+    WranglerLogger.debug(f"no_geometry_links A nodes not found: {(A_positions == -1).sum():,}; B nodes not found: {(B_positions == -1).sum():,}")
     WranglerLogger.debug(f"no_geometry_links:\n{no_geometry_links}")
-    no_geometry_links['geometry'] = no_geometry_links.apply(create_line, axis=1)
-    # we're done with these columns -- drop them
-    no_geometry_links.drop(columns=[
-      'model_node_id_A','X_A','Y_A','_merge_A',
-      'model_node_id_B','X_B','Y_B','_merge_B'], 
-      inplace=True)
+    # create simple two-point lines from the node coordinates, in an (n links, 2 points, 2 coords) array
+    no_geometry_coords = np.stack([node_xy[A_positions], node_xy[B_positions]], axis=1)
+    no_geometry_links = no_geometry_links.assign(geometry=gpd.GeoSeries(
+      shapely.linestrings(no_geometry_coords), index=no_geometry_links.index, crs=shapes_gdf.crs))
 
     # create road_links_gdf now that we have geometry for everything
     road_links_gdf = gpd.GeoDataFrame(pd.concat([
-      road_links_df.loc[ pd.notnull(road_links_df.geometry) ],
-      no_geometry_links]),
-      crs=shapes_gdf.crs)
+      road_links_df.loc[ ~missing_geometry ],
+      no_geometry_links], ignore_index=True, copy=False),
+      geometry='geometry', crs=shapes_gdf.crs)
     WranglerLogger.debug(f"Created road_links_gdf with dtypes:\n{road_links_gdf.dtypes}")
     WranglerLogger.debug(f"road_links_gdf:\n{road_links_gdf}")
 
     # fill in missing managed values with 0
     WranglerLogger.debug(f"road_links_gdf['managed'].value_counts():\n{road_links_gdf['managed'].value_counts()}")
-    WranglerLogger.debug(f"road_links_gdf['managed'].apply(type).value_counts():\n{road_links_gdf['managed'].apply(type).value_counts()}")
-    road_links_gdf.loc[road_links_gdf.managed == '', 'managed'] = 0 # blank -> 0
-    road_links_gdf['managed'] = road_links_gdf['managed'].astype(int)
+    WranglerLogger.debug(f"road_links_gdf['managed'].map(type).value_counts():\n{road_links_gdf['managed'].map(type).value_counts()}")
+    # blank -> 0 and convert to int in one pass
+    road_links_gdf['managed'] = road_links_gdf['managed'].replace('', '0').astype(int)
     WranglerLogger.debug(f"road_links_gdf['managed'].value_counts():\n{road_links_gdf['managed'].value_counts()}")
 
     # The columns lanes and ML_lanes are a combination of types, including dictionaries representing time-scoped versions
     # Fix this according to network_wrangler standard
-    fix_link_lanes(road_links_gdf, lanes_col='lanes')
-    fix_link_lanes(road_links_gdf, lanes_col='ML_lanes')
+    fix_link_lanes(road_links_gdf, lanes_cols=['lanes', 'ML_lanes'])
 
     # Access columns will be fixed after all links are added (including transit links)
 
     # network_wrangler requires distance field
-    road_links_gdf_feet = road_links_gdf.to_crs(epsg=2227)
-    road_links_gdf_feet['distance'] = road_links_gdf_feet.length / 5280 # distance is in miles
-    # join back to road_links_gdf
-    road_links_gdf = road_links_gdf.merge(
-      right=road_links_gdf_feet[['A','B','distance']],
-      how='left',
-      on=['A','B'],
-      validate='one_to_one'
-    )
+    # measure in the projected crs (feet) without building projected geometries; the rows are in the same order
+    road_links_gdf['distance'] = projected_lengths(road_links_gdf.geometry, crs=2227) / 5280 # distance is in miles
     # shape_id is a string
     road_links_gdf['shape_id'] = road_links_gdf.model_link_id.astype(str)
 
@@ -689,15 +740,21 @@ if __name__ == "__main__":
     # The gtfs feed covers the month of October 2023; select to Wednesday, October 11, 2023
     # gtfs_model doesn't include calendar_dates so read this ourselves
     # tableau viz of this feed: https://10ay.online.tableau.com/#/site/metropolitantransportationcommission/views/regional_feed_511_2023-10/Dashboard1?:iid=1
-    calendar_dates_df = pd.read_csv(INPUT_2023GTFS / "calendar_dates.txt")
-    WranglerLogger.debug(f"calendar_dates_df (len={len(calendar_dates_df):,}):\n{calendar_dates_df}")
-    calendar_dates_df = calendar_dates_df.loc[ (calendar_dates_df.date == 20231011) & (calendar_dates_df.exception_type == 1) ]
-    WranglerLogger.debug(f"After filtering calendar_dates_df (len={len(calendar_dates_df):,}):\n{calendar_dates_df}")
-    # make service_id a string
-    calendar_dates_df['service_id'] = calendar_dates_df['service_id'].astype(str)
-    service_ids_df = calendar_dates_df[['service_id']].drop_duplicates().reset_index(drop=True)
-    # Convert DataFrame to list for the updated load_feed_from_path function
-    service_ids = service_ids_df['service_id'].tolist()
+    # Read with pyarrow (reading service_id as a string) and filter the Arrow table so that only the
+    # matching rows are converted to python objects
+    calendar_dates_table = pyarrow.csv.read_csv(
+      INPUT_2023GTFS / "calendar_dates.txt",
+      convert_options=pyarrow.csv.ConvertOptions(column_types={
+        'service_id':pyarrow.string(), 'date':pyarrow.int32(), 'exception_type':pyarrow.int8()
+      })
+    )
+    WranglerLogger.debug(f"calendar_dates_table (len={calendar_dates_table.num_rows:,})")
+    calendar_dates_table = calendar_dates_table.filter(
+      (pyarrow.compute.field('date') == 20231011) & (pyarrow.compute.field('exception_type') == 1)
+    )
+    WranglerLogger.debug(f"After filtering calendar_dates_table (len={calendar_dates_table.num_rows:,}):\n{calendar_dates_table.to_pandas()}")
+    # Convert to list for the updated load_feed_from_path function
+    service_ids = calendar_dates_table.column('service_id').unique().to_pylist()
     WranglerLogger.debug(f"After filtering service_ids (len={len(service_ids):,}):\n{service_ids}")
 
     # Read a GTFS network (not wrangler_flavored)
@@ -709,10 +766,16 @@ if __name__ == "__main__":
     # drop SFO Airport rail/bus for now
     drop_transit_agency(gtfs_model, agency_id='SI')
 
+    # Read the county shapefile once; it's used for the boundary here and to assign counties to new stations below
+    counties_gdf = gpd.read_file(COUNTY_SHAPEFILE, engine='pyogrio', use_arrow=True)
+
     # filter out routes outside of Bay Area
+    # Dissolve the nine counties into a single boundary polygon so the stop-in-boundary
+    # test is against one polygon rather than one per county polygon
+    bay_area_boundary_gdf = counties_gdf[['geometry']].dissolve()
     filter_transit_by_boundary(
       gtfs_model,
-      COUNTY_SHAPEFILE, 
+      bay_area_boundary_gdf,
       partially_include_route_type_action={RouteType.RAIL:'truncate'})
     WranglerLogger.debug(f"gtfs_model:\n{gtfs_model}")
 
@@ -772,131 +835,121 @@ if __name__ == "__main__":
       '65866',  # "Patrick Henry Pocket Track"
     }
     # create nodes for these stations
-    new_station_nodes_gdf = create_nodes_for_new_stations(ADD_STOP_IDS, gtfs_model, nodes_gdf)
+    new_station_nodes_gdf = create_nodes_for_new_stations(ADD_STOP_IDS, gtfs_model, nodes_gdf, counties_gdf)
 
     # add them to road_nodes_gdf
     road_nodes_gdf = gpd.GeoDataFrame(pd.concat([
       road_nodes_gdf, 
-      new_station_nodes_gdf.drop(columns=['stop_id'])], ignore_index=True))
+      new_station_nodes_gdf.drop(columns=['stop_id'])], ignore_index=True, copy=False),
+      geometry='geometry', crs=road_nodes_gdf.crs)
 
-    stop_id_to_model_node_id = new_station_nodes_gdf[['stop_id','model_node_id']].set_index('stop_id').to_dict()['model_node_id']
+    stop_id_to_model_node_id = dict(zip(new_station_nodes_gdf['stop_id'].tolist(), new_station_nodes_gdf['model_node_id'].tolist()))
     WranglerLogger.debug(f"stop_id_to_model_node_id={stop_id_to_model_node_id}")
 
-    stop_id_to_model_node_id['FRMT'] = 2625947  # BART Fremont
-    stop_id_to_model_node_id['PITT'] = 3097273  # BART Pittsburg/Baypoint
-    stop_id_to_model_node_id['SBRN'] = 1556366  # BART San Bruno
-    stop_id_to_model_node_id['SFIA'] = 1556368  # BART SFO
-    stop_id_to_model_node_id['MLBR'] = 1556367  # BART Millbrae
-    stop_id_to_model_node_id['AM:SUI'] = 3547320  # Capitol Corridor Suisun-Fairfield
-    stop_id_to_model_node_id['AM:DAV'] = 3547319  # Capitol Corridor Davis
-    stop_id_to_model_node_id['17166'] = 1027771 # Fourth and King NB
-    stop_id_to_model_node_id['17397'] = 1027891 # Fourth and King SB
-
-    stop_id_to_model_node_id['14534'] = 1027749 # The Embarcadero & Washington St SB
-    stop_id_to_model_node_id['14726'] = 1027750 # Don Chee Way/Steuart St WB
-    stop_id_to_model_node_id['15682'] = 1027788 # Market St & Main St EB
-    stop_id_to_model_node_id['14727'] = 1027790 # Don Chee Way/Steuart St EB
-    stop_id_to_model_node_id['14532'] = 1027791 # The Embarcadero & Washington St NB
-    stop_id_to_model_node_id['14006'] = 1028013 # Church St & Duboce Ave
-
-    stop_id_to_model_node_id['13985'] = 1028012 # Church St & Market St
-    stop_id_to_model_node_id['14004'] = 1027961 # Church St & Day St
-    stop_id_to_model_node_id['13538'] = 1027963 # 30th St & Dolores St
-    stop_id_to_model_node_id['17778'] = 1027897 # Balboa Park BART/Mezzanine Level to San Jose Ave & Geneva Ave
-
-    stop_id_to_model_node_id['13385'] = 1027945 # 19th Ave & Randolph St NB
-    stop_id_to_model_node_id['13361'] = 1027946 # 19th Ave & Junipero Serra Blvd NB
-    stop_id_to_model_node_id['16262'] = 1027936 # San Jose Ave & Geneva Ave
-
-    stop_id_to_model_node_id['72011'] = 1028039 # SF Ferry Terminal Gate E
-    stop_id_to_model_node_id['72012'] = 1028039 # SF Ferry Terminal Gate G
-    stop_id_to_model_node_id['72013'] = 1027623 # SF Ferry Terminal Gate F (combine with previous?)
-    stop_id_to_model_node_id['7205']  = 1556391 # South San Francisco Ferry Terminal
-    stop_id_to_model_node_id['7208']  = 2625971 # Main Street Alameda Ferry Terminal
-    stop_id_to_model_node_id['7209']  = 2625970 # Oakland Ferry Terminal
-    stop_id_to_model_node_id['TF:2']  = 1026197 # San Francisco Ferry Terminal for Treasure Island route
-    stop_id_to_model_node_id['GF:43007'] = 5026530 # Tiburon Ferry Landing
-    stop_id_to_model_node_id['GF:43002'] = 5026531 # Angel Island Ferry Landing
-
-    stop_id_to_model_node_id['64806'] = 2192891 # Baypointe WB
-    stop_id_to_model_node_id['64807'] = 2192908 # Champion WB
-    stop_id_to_model_node_id['64800'] = 2192937 # Champion EB
-    stop_id_to_model_node_id['64760'] = 2192855 # Baypointe EB
-
-    # TODO: this is silly. Should just specify local sequence and then create these automatically...
-
-    # Caltrain NB
-    stop_id_to_model_node_id['70321'] = 2192813 # Gilroy NB 
-    stop_id_to_model_node_id['70311'] = 2192812 # San Martin NB
-    stop_id_to_model_node_id['70301'] = 2192811 # Morgan Hill NB
-    stop_id_to_model_node_id['70291'] = 2192810 # Blossom Hill NB
-    stop_id_to_model_node_id['70281'] = 2192809 # Capitol NB
-    stop_id_to_model_node_id['70271'] = 2192808 # Tamien NB
-    stop_id_to_model_node_id['70261'] = 2192815 # San Jose Diridon NB
-    stop_id_to_model_node_id['70251'] = 2172876 # College Park Station NB
-    stop_id_to_model_node_id['70231'] = 2192817 # Lawrence NB
-    stop_id_to_model_node_id['70241'] = 2192816 # Santa Clara NB
-    stop_id_to_model_node_id['70221'] = 2192818 # Sunnyvale NB
-    stop_id_to_model_node_id['70211'] = 2192819 # Mountain View NB
-    stop_id_to_model_node_id['70171'] = 2192822 # Palo Alto NB
-    stop_id_to_model_node_id['70141'] = 1556381 # Redwood City NB
-    stop_id_to_model_node_id['70121'] = 1556386 # Belmont NB
-    stop_id_to_model_node_id['70111'] = 1556382 # Hillsdale NB
-    stop_id_to_model_node_id['70131'] = 1556385 # San Carlos NB
-    stop_id_to_model_node_id['70051'] = 1556390 # San Bruno NB
-    stop_id_to_model_node_id['70091'] = 1556388 # San Mateo NB
-    stop_id_to_model_node_id['70061'] = 1556383 # Millbrae NB
-    stop_id_to_model_node_id['70041'] = 1556384 # South San Francisco NB
-    stop_id_to_model_node_id['70021'] = 1027622 # 22nd Street NB
-    stop_id_to_model_node_id['70011'] = 1027620 # San Francisco NB
-    # Caltrain SB
-    stop_id_to_model_node_id['70012'] = 1027617 # San Francisco SB
-    stop_id_to_model_node_id['70022'] = 1027618 # 22nd Street SB
-    stop_id_to_model_node_id['70042'] = 1556369 # South San Francisco SB
-    stop_id_to_model_node_id['70052'] = 1556370 # San Bruno SB
-    stop_id_to_model_node_id['70062'] = 1556371 # Millbrae SB
-    stop_id_to_model_node_id['70092'] = 1556373 # San Mateo SB
-    stop_id_to_model_node_id['70132'] = 1556377 # San Carlos SB
-    stop_id_to_model_node_id['70112'] = 1556375 # Hillsdale SB
-    stop_id_to_model_node_id['70122'] = 1556376 # Belmont
-    stop_id_to_model_node_id['70142'] = 1556378 # Redwood City SB
-    stop_id_to_model_node_id['70172'] = 2192799 # Palo Alto SB
-    stop_id_to_model_node_id['70212'] = 2192802 # Mountain View SB
-    stop_id_to_model_node_id['70222'] = 2192803 # Sunnyvale SB
-    stop_id_to_model_node_id['70242'] = 2192805 # Santa Clara SB
-    stop_id_to_model_node_id['70232'] = 2192804 # Lawrence SB
-    stop_id_to_model_node_id['70262'] = 2192807 # San Jose SB
-    # VTA
-    stop_id_to_model_node_id['64746'] = 2192842 # Convention Center
-    stop_id_to_model_node_id['64748'] = 2192843 # San Antonio to Santa Clara
-    stop_id_to_model_node_id['64797'] = 2192934 # Old Ironsides
-    stop_id_to_model_node_id['64810'] = 2192911 # Old Ironsides
-    # Set the name in road_nodes_gdf to the stop_name for these nodes using dataframe joins
+    # stations/stops in the gtfs feed that correspond to existing model nodes
+    stop_id_to_model_node_id.update({
+      'FRMT': 2625947, # BART Fremont
+      'PITT': 3097273, # BART Pittsburg/Baypoint
+      'SBRN': 1556366, # BART San Bruno
+      'SFIA': 1556368, # BART SFO
+      'MLBR': 1556367, # BART Millbrae
+      'AM:SUI': 3547320, # Capitol Corridor Suisun-Fairfield
+      'AM:DAV': 3547319, # Capitol Corridor Davis
+      '17166': 1027771, # Fourth and King NB
+      '17397': 1027891, # Fourth and King SB
+
+      '14534': 1027749, # The Embarcadero & Washington St SB
+      '14726': 1027750, # Don Chee Way/Steuart St WB
+      '15682': 1027788, # Market St & Main St EB
+      '14727': 1027790, # Don Chee Way/Steuart St EB
+      '14532': 1027791, # The Embarcadero & Washington St NB
+      '14006': 1028013, # Church St & Duboce Ave
+
+      '13985': 1028012, # Church St & Market St
+      '14004': 1027961, # Church St & Day St
+      '13538': 1027963, # 30th St & Dolores St
+      '17778': 1027897, # Balboa Park BART/Mezzanine Level to San Jose Ave & Geneva Ave
+
+      '13385': 1027945, # 19th Ave & Randolph St NB
+      '13361': 1027946, # 19th Ave & Junipero Serra Blvd NB
+      '16262': 1027936, # San Jose Ave & Geneva Ave
+
+      '72011': 1028039, # SF Ferry Terminal Gate E
+      '72012': 1028039, # SF Ferry Terminal Gate G
+      '72013': 1027623, # SF Ferry Terminal Gate F (combine with previous?)
+      '7205': 1556391, # South San Francisco Ferry Terminal
+      '7208': 2625971, # Main Street Alameda Ferry Terminal
+      '7209': 2625970, # Oakland Ferry Terminal
+      'TF:2': 1026197, # San Francisco Ferry Terminal for Treasure Island route
+      'GF:43007': 5026530, # Tiburon Ferry Landing
+      'GF:43002': 5026531, # Angel Island Ferry Landing
+
+      '64806': 2192891, # Baypointe WB
+      '64807': 2192908, # Champion WB
+      '64800': 2192937, # Champion EB
+      '64760': 2192855, # Baypointe EB
+
+      # TODO: this is silly. Should just specify local sequence and then create these automatically...
+
+      # Caltrain NB
+      '70321': 2192813, # Gilroy NB
+      '70311': 2192812, # San Martin NB
+      '70301': 2192811, # Morgan Hill NB
+      '70291': 2192810, # Blossom Hill NB
+      '70281': 2192809, # Capitol NB
+      '70271': 2192808, # Tamien NB
+      '70261': 2192815, # San Jose Diridon NB
+      '70251': 2172876, # College Park Station NB
+      '70231': 2192817, # Lawrence NB
+      '70241': 2192816, # Santa Clara NB
+      '70221': 2192818, # Sunnyvale NB
+      '70211': 2192819, # Mountain View NB
+      '70171': 2192822, # Palo Alto NB
+      '70141': 1556381, # Redwood City NB
+      '70121': 1556386, # Belmont NB
+      '70111': 1556382, # Hillsdale NB
+      '70131': 1556385, # San Carlos NB
+      '70051': 1556390, # San Bruno NB
+      '70091': 1556388, # San Mateo NB
+      '70061': 1556383, # Millbrae NB
+      '70041': 1556384, # South San Francisco NB
+      '70021': 1027622, # 22nd Street NB
+      '70011': 1027620, # San Francisco NB
+      # Caltrain SB
+      '70012': 1027617, # San Francisco SB
+      '70022': 1027618, # 22nd Street SB
+      '70042': 1556369, # South San Francisco SB
+      '70052': 1556370, # San Bruno SB
+      '70062': 1556371, # Millbrae SB
+      '70092': 1556373, # San Mateo SB
+      '70132': 1556377, # San Carlos SB
+      '70112': 1556375, # Hillsdale SB
+      '70122': 1556376, # Belmont
+      '70142': 1556378, # Redwood City SB
+      '70172': 2192799, # Palo Alto SB
+      '70212': 2192802, # Mountain View SB
+      '70222': 2192803, # Sunnyvale SB
+      '70242': 2192805, # Santa Clara SB
+      '70232': 2192804, # Lawrence SB
+      '70262': 2192807, # San Jose SB
+      # VTA
+      '64746': 2192842, # Convention Center
+      '64748': 2192843, # San Antonio to Santa Clara
+      '64797': 2192934, # Old Ironsides
+      '64810': 2192911, # Old Ironsides
+    })
+    # Set the name in road_nodes_gdf to the stop_name for these nodes
     WranglerLogger.info("Setting node names to stop names for mapped transit stops")
 
-    # Create a dataframe from the stop_id to model_node_id mapping
-    stop_node_mapping_df = pd.DataFrame(
-      list(stop_id_to_model_node_id.items()), 
-      columns=['stop_id', 'model_node_id']
-    ).drop_duplicates(subset=['model_node_id'], keep='first') # don't create duplicate model_node_ids
-    # Join with gtfs stops to get stop names
-    stop_node_mapping_df = stop_node_mapping_df.merge(
-      gtfs_model.stops[['stop_id', 'stop_name']], 
-      on='stop_id', 
-      how='left'
-    )
-    # Merge with the mapping to get stop names
-    road_nodes_gdf = road_nodes_gdf.merge(
-      stop_node_mapping_df[['model_node_id', 'stop_name']], 
-      on='model_node_id', 
-      how='left',
-      indicator=True
+    stop_id_to_stop_name = dict(zip(gtfs_model.stops['stop_id'], gtfs_model.stops['stop_name']))
+    model_node_id_to_stop_name = {}
+    for stop_id, model_node_id in stop_id_to_model_node_id.items():
+      # if multiple stops map to the same model_node_id, the first one names it
+      model_node_id_to_stop_name.setdefault(model_node_id, stop_id_to_stop_name.get(stop_id))
+    # Map model_node_id -> stop_name onto the nodes, only filling in names that are missing
+    road_nodes_gdf['name'] = road_nodes_gdf['name'].fillna(
+      road_nodes_gdf['model_node_id'].map(model_node_id_to_stop_name)
     )
- #    WranglerLogger.debug(f"road_nodes_gdf.loc[road_nodes_gdf._merge=='both']:\n{road_nodes_gdf.loc[road_nodes_gdf._merge=='both']}")
-    road_nodes_gdf.loc[ pd.isna(road_nodes_gdf['name']) & (road_nodes_gdf._merge == 'both'), 'name'] = road_nodes_gdf['stop_name']
-    # CT:L5WranglerLogger.debug(f"road_nodes_gdf.loc[road_nodes_gdf._merge=='both']:\n{road_nodes_gdf.loc[road_nodes_gdf._merge=='both']}")
-    # Drop temporary columns
-    road_nodes_gdf.drop(columns=['stop_name','_merge'], inplace=True)
 
     # Define transit links to add between new stations
     # model_ids should either be mapped to model_node_ids 
@@ -1035,52 +1088,66 @@ if __name__ == "__main__":
 
     # Add new links to road_links_gdf
     if len(new_transit_links_gdf) > 0:
-      road_links_gdf = gpd.GeoDataFrame(pd.concat([road_links_gdf, new_transit_links_gdf], ignore_index=True))
+      road_links_gdf = gpd.GeoDataFrame(
+        pd.concat([road_links_gdf, new_transit_links_gdf], ignore_index=True, copy=False),
+        geometry='geometry', crs=road_links_gdf.crs)
       WranglerLogger.info(f"Added {len(new_transit_links_gdf)} new transit links to roadway network")
 
-    # remove Suisun-Fairfield to Davis and vice versa since Fairfield-Vacavaville was added in between
-    len_road_links_gdf = len(road_links_gdf)
-    road_links_gdf = road_links_gdf.loc[ (road_links_gdf.A != stop_id_to_model_node_id['AM:SUI']) | ((road_links_gdf.B != stop_id_to_model_node_id['AM:DAV']))]
-    road_links_gdf = road_links_gdf.loc[ (road_links_gdf.B != stop_id_to_model_node_id['AM:SUI']) | ((road_links_gdf.A != stop_id_to_model_node_id['AM:DAV']))]
-    WranglerLogger.debug(f"{len_road_links_gdf=:,} {len(road_links_gdf)=:,}")
-    assert(len(road_links_gdf) == len_road_links_gdf-2)
-
-    # remove VTA Convention Center to Santa Clara since San Antonio was added in between
+    # Remove transit links which have been superseded by new stations added in between
+    # Format: (from_stop_id, to_stop_id)
+    TRANSIT_LINKS_TO_REMOVE = [
+      # Capitol Corridor: Fairfield-Vacaville was added in between
+      ('AM:SUI', 'AM:DAV'),  # Suisun-Fairfield to Davis
+      ('AM:DAV', 'AM:SUI'),  # Davis to Suisun-Fairfield
+      # VTA Green Line: San Antonio was added in between
+      ('64746',  '64748'),   # Convention Center to Santa Clara
+    ]
+    links_to_remove = {
+      (stop_id_to_model_node_id[from_stop_id], stop_id_to_model_node_id[to_stop_id])
+      for (from_stop_id, to_stop_id) in TRANSIT_LINKS_TO_REMOVE
+    }
+    # filter with a single pass over (A,B) rather than one pass per link
     len_road_links_gdf = len(road_links_gdf)
-    road_links_gdf = road_links_gdf.loc[ (road_links_gdf.A != stop_id_to_model_node_id['64746']) | ((road_links_gdf.B != stop_id_to_model_node_id['64748']))]
+    road_links_AB_index = pd.MultiIndex.from_arrays([road_links_gdf.A.values, road_links_gdf.B.values])
+    road_links_gdf = road_links_gdf.loc[ ~road_links_AB_index.isin(links_to_remove) ]
     WranglerLogger.debug(f"{len_road_links_gdf=:,} {len(road_links_gdf)=:,}")
-    assert(len(road_links_gdf) == len_road_links_gdf-1)
+    assert(len(road_links_gdf) == len_road_links_gdf-len(links_to_remove))
 
     # TODO: There are others to remove but maybe just do it programmatically :D
 
+    # Index the stops by stop_id once for the stop coordinate lookups below
+    stops_by_stop_id = gtfs_model.stops.set_index('stop_id')
+
     # The Hillsdale Caltrain station moved in 2021
     HILLSDALE_STOP_ID = '70112'
-    hillsdale_stop_dict = gtfs_model.stops.loc[gtfs_model.stops.stop_id==HILLSDALE_STOP_ID].to_dict(orient='records')[0]
+    hillsdale_stop_dict = stops_by_stop_id.loc[HILLSDALE_STOP_ID].to_dict()
     WranglerLogger.debug(f"Hillsdale stop:{hillsdale_stop_dict}")
 
     # Vasco Rt Amtrak Station seems to be located slightly incorrectly
     AMTRAK_VASCO_STOP_ID = 'CE:VAS'
-    amtrak_vasco_stop_dict = gtfs_model.stops.loc[gtfs_model.stops.stop_id==AMTRAK_VASCO_STOP_ID].to_dict(orient='records')[0]
+    amtrak_vasco_stop_dict = stops_by_stop_id.loc[AMTRAK_VASCO_STOP_ID].to_dict()
     WranglerLogger.debug(f"Amtrak Vasco stop:{amtrak_vasco_stop_dict}")
 
     # J Church St & Market St Station seems to be located incorrectly
     J_CHURCH_MARKET_STOP_ID = '18059'
-    j_church_market_stop_dict = gtfs_model.stops.loc[gtfs_model.stops.stop_id==J_CHURCH_MARKET_STOP_ID].to_dict(orient='records')[0]
+    j_church_market_stop_dict = stops_by_stop_id.loc[J_CHURCH_MARKET_STOP_ID].to_dict()
 
     # M 19th Ave & Randolf Street NB seems to located incorrectly
     M_19TH_RANDOLF_STOP_ID = '13385'
-    m_19th_randolf_stop_dict = gtfs_model.stops.loc[gtfs_model.stops.stop_id==M_19TH_RANDOLF_STOP_ID].to_dict(orient='records')[0]
+    m_19th_randolf_stop_dict = stops_by_stop_id.loc[M_19TH_RANDOLF_STOP_ID].to_dict()
 
     # M San Jose and Geneva move
     M_SAN_JOSE_GENEVA_STOP_ID = '16262'
-    m_san_jose_geneva_stop_id = gtfs_model.stops.loc[gtfs_model.stops.stop_id==M_SAN_JOSE_GENEVA_STOP_ID].to_dict(orient='records')[0]
+    m_san_jose_geneva_stop_id = stops_by_stop_id.loc[M_SAN_JOSE_GENEVA_STOP_ID].to_dict()
 
     # Finally, truncate the gtfs_model SolTrans Route B because it includes one stop out of region
     truncate_route_at_stop(gtfs_model, route_id="ST:B", direction_id=0, stop_id='829201', truncate="before")
     truncate_route_at_stop(gtfs_model, route_id="ST:B", direction_id=1, stop_id='829201', truncate="after")
 
     # TODO: What is locationReferences?  Can we drop?  Convert to string for now
-    road_links_gdf['locationReferences'] = road_links_gdf['locationReferences'].astype(str)
+    # Use the pyarrow-backed string dtype: this converts in a single pass, keeps nulls as nulls
+    # (rather than 'nan'/'None') and stores the long strings far more compactly than object dtype
+    road_links_gdf['locationReferences'] = road_links_gdf['locationReferences'].astype('string[pyarrow]')
 
     fix_link_access(road_links_gdf, 'access')
     fix_link_access(road_links_gdf, 'ML_access')
@@ -1145,8 +1212,10 @@ if __name__ == "__main__":
     roadway_network.move_nodes(move_transit_nodes_df)
 
     # Check for any columns with lists after project application and convert them all to strings
+    # Scoped value columns (sc_*) are lists by design, and stay structured so network_wrangler can read them back
     WranglerLogger.debug("Checking for list columns after project application...")
     for col in roadway_network.links_df.columns:
+      if col.startswith('sc_'): continue
       if roadway_network.links_df[col].dtype == 'object':
         # Check entire column, not just sample
         has_lists = False
@@ -1177,6 +1246,18 @@ if __name__ == "__main__":
         overwrite=True,
         true_shape=True
       )
+      # write_roadway doesn't expose parquet writer options, so re-encode its output with downcast id columns,
+      # zstd compression, dictionary encoding for the repeated string columns and bounded row groups for faster reloads
+      for parquet_file in sorted(roadway_network_dir.glob("road_net_2023_*.parquet")):
+        pyarrow.parquet.write_table(
+          downcast_integer_columns(pyarrow.parquet.read_table(parquet_file), DOWNCAST_INTEGER_COLUMNS),
+          parquet_file,
+          compression='zstd',
+          compression_level=3,
+          use_dictionary=True,
+          row_group_size=262_144
+        )
+        WranglerLogger.debug(f"Re-encoded {parquet_file}")
       WranglerLogger.info(f"Roadway network saved to {roadway_network_dir}")
     except Exception as e:
       WranglerLogger.error(f"Error writing roadway network: {e}")
@@ -1184,21 +1265,34 @@ if __name__ == "__main__":
     
     WranglerLogger.info("Finished writing 2023 roadway network files")
 
-    tableau_utils.write_geodataframe_as_tableau_hyper(
-      roadway_network.links_df,  # drop distance==0 links because otherwise this will error
-      (OUTPUT_DIR / "mtc_links.hyper").resolve(),
-      "mtc_links"
-    )
-    tableau_utils.write_geodataframe_as_tableau_hyper(
-      roadway_network.nodes_df,
-      (OUTPUT_DIR / "mtc_nodes.hyper").resolve(),
-      "mtc_nodes"
-    )
-
-    # write the gtfs version of the transit network now, before converting to Feed
-    WranglerLogger.info(f"Writing gtfs_model to {transit_network_dir}")
-    transit_gtfs_model_dir.mkdir(exist_ok=True)
-    write_transit(gtfs_model, out_dir=transit_gtfs_model_dir, file_format="txt", overwrite=True)
+    # The links and nodes hyper files are independent (each write uses its own connection to a shared
+    # Hyper process), so write them concurrently, and overlap them with writing the gtfs_model
+    with tableau_utils.start_hyper_process() as hyper_process, \
+         concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+      hyper_futures = [
+        executor.submit(
+          tableau_utils.write_geodataframe_as_tableau_hyper,
+          roadway_network.links_df,  # drop distance==0 links because otherwise this will error
+          (OUTPUT_DIR / "mtc_links.hyper").resolve(),
+          "mtc_links",
+          hyper_process=hyper_process
+        ),
+        executor.submit(
+          tableau_utils.write_geodataframe_as_tableau_hyper,
+          roadway_network.nodes_df,
+          (OUTPUT_DIR / "mtc_nodes.hyper").resolve(),
+          "mtc_nodes",
+          hyper_process=hyper_process
+        ),
+      ]
+
+      # write the gtfs version of the transit network now, before converting to Feed
+      WranglerLogger.info(f"Writing gtfs_model to {transit_network_dir}")
+      transit_gtfs_model_dir.mkdir(exist_ok=True)
+      write_transit(gtfs_model, out_dir=transit_gtfs_model_dir, file_format="txt", overwrite=True)
+
+      # raise any exception from the writes
+      for hyper_future in hyper_futures: hyper_future.result()
   
   # Define time periods for frequency calculation: 3a-6a, 6a-10a, 10a-3p, 3p-7p, 7p-3a
   time_periods = [
@@ -1235,11 +1329,13 @@ if __name__ == "__main__":
       WranglerLogger.debug(f"e.unmatched_stops_gdf type={type(e.unmatched_stops_gdf)} rows=\n{e.unmatched_stops_gdf}")
       
       # Rename lat/lon to X/Y for the tableau utility if they exist
-      if 'stop_lon' in e.unmatched_stops_gdf.columns and 'stop_lat' in e.unmatched_stops_gdf.columns:
-        e.unmatched_stops_gdf.rename(columns={'stop_lon': 'X', 'stop_lat': 'Y'}, inplace=True)
+      # (without modifying the DataFrame attached to the exception, which is re-raised below)
+      unmatched_stops_gdf = e.unmatched_stops_gdf
+      if 'stop_lon' in unmatched_stops_gdf.columns and 'stop_lat' in unmatched_stops_gdf.columns:
+        unmatched_stops_gdf = unmatched_stops_gdf.rename(columns={'stop_lon': 'X', 'stop_lat': 'Y'})
       
       # Write to Tableau
-      tableau_utils.write_geodataframe_as_tableau_hyper(e.unmatched_stops_gdf, unmatched_stops_file, "unmatched_stops")
+      tableau_utils.write_geodataframe_as_tableau_hyper(unmatched_stops_gdf, unmatched_stops_file, "unmatched_stops")
       
       WranglerLogger.error(f"Unmatched stops written to {unmatched_stops_file}")
     
@@ -1271,63 +1367,79 @@ if __name__ == "__main__":
   # Create TransitNetwork from the Feed and validate it
   WranglerLogger.info("Creating TransitNetwork from Feed")
   transit_network = TransitNetwork(feed=feed)
-  WranglerLogger.info(f"TransitNetwork created with {len(transit_network.feed.stops)} stops and {len(transit_network.feed.routes)} routes")
+  transit_feed = transit_network.feed
+  WranglerLogger.info(f"TransitNetwork created with {len(transit_feed.stops)} stops and {len(transit_feed.routes)} routes")
 
   # Save the transit network regardless of validation issues
   WranglerLogger.info("Saving TransitNetwork to files")
 
   try:
     transit_network_dir.mkdir(exist_ok=True)
-    write_transit(transit_network, out_dir=transit_network_dir, file_format="csv")
+    write_transit(transit_network, out_dir=transit_network_dir, file_format=TRANSIT_NETWORK_FILE_FORMAT)
     WranglerLogger.info(f"Transit network saved to {transit_network_dir}")
   except Exception as e:
     WranglerLogger.error(f"Failed to save transit network: {e}")
 
+  # Tableau Hyper debug outputs, as (GeoDataFrame, hyper file, table name); these are written together below
+  tableau_hyper_writes = []
+
   # debugging: check if any stops.stop_id or shapes.shape_model_node_ids are not in the roadway network
+  # Find the matches on the id columns, and only join the matched rows to the (wide) roadway nodes table
+  # Build the (unique) roadway model_node_id index once; its hash table is reused for each lookup
+  road_node_id_index = pd.Index(roadway_network.nodes_df['model_node_id'].to_numpy(), name='model_node_id')
+  stops_in_roadway = road_node_id_index.get_indexer(feed.stops['stop_id'].to_numpy()) >= 0
+  WranglerLogger.debug(f"feed.stops in roadway network: {stops_in_roadway.sum():,} matched, {(~stops_in_roadway).sum():,} not matched")
+  WranglerLogger.debug(f"feed.stops not in roadway network:\n{feed.stops.loc[~stops_in_roadway]}")
   stops_roadway_gdf = pd.merge(
-    left=feed.stops,
+    left=feed.stops.loc[stops_in_roadway],
     right=roadway_network.nodes_df,
-    how='outer',
+    how='inner',
     left_on='stop_id',
     right_on='model_node_id',
-    indicator=True,
     suffixes=('','_road')
   )
-  stops_roadway_gdf = gpd.GeoDataFrame(stops_roadway_gdf)
+  # the geometry is the roadway node geometry
+  stops_roadway_gdf = gpd.GeoDataFrame(stops_roadway_gdf, geometry='geometry', crs=roadway_network.nodes_df.crs)
   WranglerLogger.debug(f"type(stops_roadway_gdf):\n{type(stops_roadway_gdf)}")
-  WranglerLogger.debug(f"stops_roadway_gdf._merge.value_counts():\n{stops_roadway_gdf._merge.value_counts()}")
-  WranglerLogger.debug(f"stops_roadway_gdf.loc[ stops_roadway_gdf._merge == 'left_only']:\n{stops_roadway_gdf.loc[ stops_roadway_gdf._merge == 'left_only']}")
-  WranglerLogger.debug(f"stops_roadway_gdf.loc[ stops_roadway_gdf._merge == 'both']:\n{stops_roadway_gdf.loc[ stops_roadway_gdf._merge == 'both']}")
+  WranglerLogger.debug(f"stops_roadway_gdf:\n{stops_roadway_gdf}")
   # write this as a hyper
-  tableau_utils.write_geodataframe_as_tableau_hyper(
-    stops_roadway_gdf.loc[ stops_roadway_gdf._merge == 'both'],
+  tableau_hyper_writes.append((
+    stops_roadway_gdf,
     (OUTPUT_DIR / "stops_roadway.hyper").resolve(),
     "stops_roadway"
-  )
+  ))
+  shapes_in_roadway = road_node_id_index.get_indexer(feed.shapes['shape_model_node_id'].to_numpy()) >= 0
+  WranglerLogger.debug(f"feed.shapes in roadway network: {shapes_in_roadway.sum():,} matched, {(~shapes_in_roadway).sum():,} not matched")
+  WranglerLogger.debug(f"feed.shapes not in roadway network:\n{feed.shapes.loc[~shapes_in_roadway]}")
   shapes_roadway_gdf = pd.merge(
-    left=feed.shapes,
+    left=feed.shapes.loc[shapes_in_roadway],
     right=roadway_network.nodes_df,
-    how='outer',
+    how='inner',
     left_on='shape_model_node_id',
     right_on='model_node_id',
-    indicator=True,
     suffixes=('','_road')
   )
-  shapes_roadway_gdf = gpd.GeoDataFrame(shapes_roadway_gdf)
-  WranglerLogger.debug(f"shapes_roadway_gdf._merge.value_counts():\n{shapes_roadway_gdf._merge.value_counts()}")
-  WranglerLogger.debug(f"shapes_roadway_gdf.loc[ stops_roadway_gdf._merge == 'left_only']:\n{shapes_roadway_gdf.loc[ shapes_roadway_gdf._merge == 'left_only']}")
-  WranglerLogger.debug(f"shapes_roadway_gdf.loc[ stops_roadway_gdf._merge == 'both']:\n{shapes_roadway_gdf.loc[ shapes_roadway_gdf._merge == 'both']}")
+  shapes_roadway_gdf = gpd.GeoDataFrame(shapes_roadway_gdf, geometry='geometry', crs=roadway_network.nodes_df.crs)
+  WranglerLogger.debug(f"shapes_roadway_gdf:\n{shapes_roadway_gdf}")
   # write this as a hyper
-  tableau_utils.write_geodataframe_as_tableau_hyper(
-    shapes_roadway_gdf.loc[ shapes_roadway_gdf._merge == 'both'],
+  tableau_hyper_writes.append((
+    shapes_roadway_gdf,
     (OUTPUT_DIR / "shapes_roadway.hyper").resolve(),
     "shapes_roadway"
-  )
+  ))
 
   # This is done by setting the road_net to roadway_network but we'll call this explicitly so
   # we can write out more useful debug data
-  missing_shape_links = network_wrangler.transit.validate.shape_links_without_road_links(feed.shapes, roadway_network.links_df)
+  # The two validations only read the feed and roadway tables, so run them concurrently
+  with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+    missing_shape_links_future = executor.submit(
+      network_wrangler.transit.validate.shape_links_without_road_links, feed.shapes, roadway_network.links_df)
+    missing_nodes_future = executor.submit(
+      network_wrangler.transit.validate.transit_nodes_without_road_nodes, feed, roadway_network.nodes_df)
+    missing_shape_links = missing_shape_links_future.result()
+    missing_nodes = missing_nodes_future.result()
   WranglerLogger.debug(f"missing_shape_links:\n{missing_shape_links}")
+  WranglerLogger.debug(f"missing_nodes:\n{missing_nodes}")
 
   if len(missing_shape_links) > 0:
     # Write out missing_shape_links as tableau hyper
@@ -1338,59 +1450,62 @@ if __name__ == "__main__":
     missing_shape_links = missing_shape_links.loc[ missing_shape_links.A != missing_shape_links.B]
     WranglerLogger.warning(f"Filtered these out; have {len(missing_shape_links):,} remaining")
 
-    # Create LineString geometry from shape point coordinates
-    
-    def create_line_from_shape_pts(row):
-      # Use shape_pt_lat/lon columns directly
-      point_a = shapely.geometry.Point(row['shape_pt_lon_A'], row['shape_pt_lat_A'])
-      point_b = shapely.geometry.Point(row['shape_pt_lon_B'], row['shape_pt_lat_B'])
-      return shapely.geometry.LineString([point_a, point_b])
-    
-    missing_shape_links['geometry'] = missing_shape_links.apply(create_line_from_shape_pts, axis=1)
-    
     # Convert to GeoDataFrame if there are valid geometries
     if len(missing_shape_links) > 0:
+        # Create LineString geometry from shape point coordinates, only for the links remaining after filtering
+        # Use shape_pt_lat/lon columns directly, written into an (n links, 2 points, 2 coords) array
+        shape_link_coords = np.empty((len(missing_shape_links), 2, 2), dtype=np.float64)
+        shape_link_coords[:,0,0] = missing_shape_links['shape_pt_lon_A'].to_numpy()
+        shape_link_coords[:,0,1] = missing_shape_links['shape_pt_lat_A'].to_numpy()
+        shape_link_coords[:,1,0] = missing_shape_links['shape_pt_lon_B'].to_numpy()
+        shape_link_coords[:,1,1] = missing_shape_links['shape_pt_lat_B'].to_numpy()
+        # pass the geometry array directly rather than setting a column on the filtered frame first
         missing_shape_links_gdf = gpd.GeoDataFrame(
             missing_shape_links,
-            geometry='geometry',
+            geometry=shapely.linestrings(shape_link_coords),
             crs='EPSG:4326'  # lat/lon coordinates are in WGS84
         )
         
         # Write to Tableau Hyper
-        tableau_utils.write_geodataframe_as_tableau_hyper(
+        tableau_hyper_writes.append((
             missing_shape_links_gdf,
             (OUTPUT_DIR / "missing_shape_links.hyper").resolve(),
             "missing_shape_links"
-        )
-        WranglerLogger.info(f"Wrote {len(missing_shape_links_gdf)} missing shape links to Tableau Hyper file")
+        ))
+        WranglerLogger.info(f"Writing {len(missing_shape_links_gdf)} missing shape links to Tableau Hyper file")
     else:
         WranglerLogger.warning("No valid missing shape links to write (all had invalid coordinates)")
 
-  missing_nodes = network_wrangler.transit.validate.transit_nodes_without_road_nodes(feed, roadway_network.nodes_df)
-  WranglerLogger.debug(f"missing_nodes:\n{missing_nodes}")
-
-  # Set the roadway network - wrap in try/catch since this can fail
-  try:
-    transit_network.road_net = roadway_network
-    WranglerLogger.info("Successfully associated roadway network with transit network")
-  except Exception as e:
-    WranglerLogger.warning(f"Could not associate roadway network: {e}")
-    WranglerLogger.warning("Continuing without roadway network association")
-
-  
-  try:
-    write_transit(transit_network, out_dir=transit_network_dir, file_format="csv")
-    WranglerLogger.info(f"Transit network saved to {transit_network_dir}")
-  except Exception as e:
-    WranglerLogger.error(f"Failed to save transit network: {e}")
-  
-  # Log summary statistics
-  WranglerLogger.info("=== Transit Network Summary ===")
-  WranglerLogger.info(f"Routes: {len(transit_network.feed.routes)}")
-  WranglerLogger.info(f"Stops: {len(transit_network.feed.stops)}")
-  WranglerLogger.info(f"Trips: {len(transit_network.feed.trips)}")
-  WranglerLogger.info(f"Stop Times: {len(transit_network.feed.stop_times)}")
-  WranglerLogger.info(f"Shapes: {len(transit_network.feed.shapes)}")
-  WranglerLogger.info(f"Frequencies: {len(transit_network.feed.frequencies)}")
-  WranglerLogger.info("===============================")
-
+  # Each write goes to its own .hyper file via its own connection to one shared Hyper process, so write them concurrently.
+  # Nothing below reads these files, so let them run in the background while the roadway network
+  # is associated (which re-runs the validation); they're waited on at the end of the script.
+  # Leaving the with block, even on an exception, waits for the writes and then closes the Hyper process.
+  with tableau_utils.start_hyper_process() as hyper_process, \
+       concurrent.futures.ThreadPoolExecutor(max_workers=len(tableau_hyper_writes)) as hyper_executor:
+    hyper_futures = [hyper_executor.submit(tableau_utils.write_geodataframe_as_tableau_hyper, *hyper_write,
+                                           hyper_process=hyper_process)
+                     for hyper_write in tableau_hyper_writes]
+
+    # Set the roadway network - wrap in try/catch since this can fail
+    try:
+      transit_network.road_net = roadway_network
+      WranglerLogger.info("Successfully associated roadway network with transit network")
+    except Exception as e:
+      WranglerLogger.warning(f"Could not associate roadway network: {e}")
+      WranglerLogger.warning("Continuing without roadway network association")
+
+    # Note: the transit network was already written above; associating the roadway network
+    # doesn't change the feed tables so there's no need to write it again
+
+    # Log summary statistics
+    WranglerLogger.info("=== Transit Network Summary ===")
+    WranglerLogger.info(f"Routes: {len(transit_feed.routes)}")
+    WranglerLogger.info(f"Stops: {len(transit_feed.stops)}")
+    WranglerLogger.info(f"Trips: {len(transit_feed.trips)}")
+    WranglerLogger.info(f"Stop Times: {len(transit_feed.stop_times)}")
+    WranglerLogger.info(f"Shapes: {len(transit_feed.shapes)}")
+    WranglerLogger.info(f"Frequencies: {len(transit_feed.frequencies)}")
+    WranglerLogger.info("===============================")
+
+    # wait for the Tableau Hyper debug outputs; raise any exception from the writes
+    for hyper_future in hyper_futures: hyper_future.result()
@@ -2,13 +2,31 @@ USAGE = """
   Utility to save geodataframes as Tableau Hyper files.
   This is useful for quickly exporting geospatial data to Tableau for visualization.
 """
+import contextlib
+import os
+import tempfile
 import shapely
 import geopandas as gpd
 import pandas as pd
+import pyarrow
+import pyarrow.parquet
 from shapely.geometry import Point
 from network_wrangler import WranglerLogger
 
-def write_geodataframe_as_tableau_hyper(in_gdf, filename, tablename):
+def start_hyper_process():
+    """
+    Starts a Hyper process that can be shared by several write_geodataframe_as_tableau_hyper() calls,
+    including concurrent ones, rather than each call starting (and stopping) its own.
+
+    The caller is responsible for closing it, either with close() or by using it as a context manager.
+
+    Returns:
+        tableauhyperapi.HyperProcess
+    """
+    import tableauhyperapi
+    return tableauhyperapi.HyperProcess(telemetry=tableauhyperapi.Telemetry.SEND_USAGE_DATA_TO_TABLEAU)
+
+def write_geodataframe_as_tableau_hyper(in_gdf, filename, tablename, hyper_process=None):
     """
     Write a GeoDataFrame or DataFrame with X,Y columns to a Tableau Hyper file.
     See https://tableau.github.io/hyper-db/docs/guides/hyper_file/geodata
@@ -20,6 +38,8 @@ def write_geodataframe_as_tableau_hyper(in_gdf, filename, tablename):
         in_gdf: A GeoDataFrame or a DataFrame with X,Y columns
         filename: Output filename for the Hyper file
         tablename: Name of the table within the Hyper file
+        hyper_process: Optional running Hyper process (from start_hyper_process()) to use.
+            If not passed, a Hyper process is started and stopped for this write.
     """
     WranglerLogger.debug(f"write_geodataframe_as_tableau_hyper: {filename=}, {tablename=}")
     
@@ -41,8 +61,10 @@ def write_geodataframe_as_tableau_hyper(in_gdf, filename, tablename):
     cols_to_str = set()
     for col in gdf.columns:
         if gdf[col].dtype == 'object':
-            # Check if any values are lists
-            if any(isinstance(val, list) for val in gdf[col].dropna()):
+            # Check if any values are lists; pure string (or all null) columns, the common case,
+            # are ruled out by pandas' C type inference without looking at the values in python
+            if pd.api.types.infer_dtype(gdf[col], skipna=True) not in ('string', 'empty') and \
+               any(isinstance(val, list) for val in gdf[col].dropna()):
                 gdf[col] = gdf[col].apply(
                     lambda x: ', '.join(map(str, x)) if isinstance(x, list) else str(x) if pd.notna(x) else ''
                 )
@@ -157,66 +179,65 @@ def write_geodataframe_as_tableau_hyper(in_gdf, filename, tablename):
     import tableauhyperapi
 
     # Convert geometry to WKT format
-    gdf['geometry_wkt'] = gdf['geometry'].apply(lambda geom: geom.wkt)
+    gdf['geometry_wkt'] = shapely.to_wkt(gdf['geometry'].values, rounding_precision=-1)
     # drop this column, we don't need it any longer
     gdf.drop(columns='geometry', inplace=True)
 
     table_def = tableauhyperapi.TableDefinition(tablename)
-    # Inserter definition contains the column definition for the values that are inserted
-    # The data input has two text values Name and Location_as_text
-    inserter_definition = []
-
-    # Specify the conversion of SqlType.text() to SqlType.tabgeography() using CAST expression in Inserter.ColumnMapping.
-    # Specify all columns into which data is inserter in Inserter.ColumnMapping list. For columns that do not require any
-    # transformations provide only the names
-    column_mappings = []
+    # The data is bulk loaded from a temporary parquet file via INSERT INTO ... SELECT ... FROM external(),
+    # so Hyper reads the columns directly rather than us boxing every cell into a python row.
+    # select_expressions contains the expression for each table column, in order;
+    # geometry_wkt is converted from text to TABLEAU.TABGEOGRAPHY using a CAST expression
+    select_expressions = []
+    # The parquet column types are set explicitly to match the SqlTypes, since pyarrow would infer
+    # the type null for the object columns of an empty frame, which Hyper can't read
+    parquet_fields = []
 
     for col in gdf.columns:
-        # geometry_wkt to be converted from WKT to geometry via column_mapping
+        # geometry_wkt to be converted from WKT to geometry via CAST
         if col == 'geometry_wkt':
             table_def.add_column('geometry', tableauhyperapi.SqlType.tabgeography())
-            # insert as geometry_wkt
-            inserter_definition.append(tableauhyperapi.TableDefinition.Column(
-                name='geometry_wkt', type=tableauhyperapi.SqlType.text(), nullability=tableauhyperapi.NOT_NULLABLE))
-            # convert to geometry
-            column_mappings.append(tableauhyperapi.Inserter.ColumnMapping(
-                'geometry', f'CAST({tableauhyperapi.escape_name("geometry_wkt")} AS TABLEAU.TABGEOGRAPHY)'))
+            select_expressions.append(f'CAST({tableauhyperapi.escape_name("geometry_wkt")} AS TABLEAU.TABGEOGRAPHY)')
+            parquet_fields.append(pyarrow.field(col, pyarrow.string()))
             continue
 
         if gdf[col].dtype == bool:
-            table_def.add_column(col, tableauhyperapi.SqlType.bool())
-            inserter_definition.append(tableauhyperapi.TableDefinition.Column(
-                name=col, type=tableauhyperapi.SqlType.bool()))  
+            sql_type = tableauhyperapi.SqlType.bool()
+            parquet_type = pyarrow.bool_()
         elif gdf[col].dtype == int:
-            table_def.add_column(col, tableauhyperapi.SqlType.int())
-            inserter_definition.append(tableauhyperapi.TableDefinition.Column(
-                name=col, type=tableauhyperapi.SqlType.int()))
+            sql_type = tableauhyperapi.SqlType.int()
+            parquet_type = pyarrow.int64()
         elif gdf[col].dtype == float:
-            table_def.add_column(col, tableauhyperapi.SqlType.double())
-            inserter_definition.append(tableauhyperapi.TableDefinition.Column(
-                name=col, type=tableauhyperapi.SqlType.double()))
+            sql_type = tableauhyperapi.SqlType.double()
+            parquet_type = pyarrow.float64()
         else:
-            table_def.add_column(col, tableauhyperapi.SqlType.text())
-            inserter_definition.append(tableauhyperapi.TableDefinition.Column(
-                name=col, type=tableauhyperapi.SqlType.text()))
+            sql_type = tableauhyperapi.SqlType.text()
+            parquet_type = pyarrow.string()
             # ensure text columns never pass NaN/None to Hyper
             gdf[col] = gdf[col].apply(lambda value: str(value) if pd.notna(value) else '')
-        column_mappings.append(col)
+        table_def.add_column(col, sql_type)
+        select_expressions.append(tableauhyperapi.escape_name(col))
+        parquet_fields.append(pyarrow.field(col, parquet_type))
 
     WranglerLogger.debug(f"table_def={table_def}")
-    WranglerLogger.debug(f"column_mappings={column_mappings}")
-
-    table_name = tableauhyperapi.TableName("Extract", tablename)
-    with tableauhyperapi.HyperProcess(telemetry=tableauhyperapi.Telemetry.SEND_USAGE_DATA_TO_TABLEAU) as hyper:
-        with tableauhyperapi.Connection(endpoint=hyper.endpoint, database=filename, 
-                                        create_mode=tableauhyperapi.CreateMode.CREATE_AND_REPLACE) as connection:
-            connection.catalog.create_schema("Extract")
-            connection.catalog.create_table(table_def)
-
-            with tableauhyperapi.Inserter(connection, table_def, columns=column_mappings, inserter_definition=inserter_definition) as inserter:
-
-                inserter.add_rows(rows=gdf.itertuples(index=False, name=None))
-                inserter.execute()
-
+    WranglerLogger.debug(f"select_expressions={select_expressions}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        parquet_file = os.path.join(tmp_dir, f"{tablename}.parquet")
+        pyarrow.parquet.write_table(
+            pyarrow.Table.from_pandas(pd.DataFrame(gdf), schema=pyarrow.schema(parquet_fields), preserve_index=False),
+            parquet_file)
+
+        # use the given hyper process without closing it, or start one for this write
+        with (contextlib.nullcontext(hyper_process) if hyper_process is not None else start_hyper_process()) as hyper:
+            with tableauhyperapi.Connection(endpoint=hyper.endpoint, database=filename, 
+                                            create_mode=tableauhyperapi.CreateMode.CREATE_AND_REPLACE) as connection:
+                connection.catalog.create_schema("Extract")
+                connection.catalog.create_table(table_def)
+
+                connection.execute_command(
+                    f"INSERT INTO {table_def.table_name} SELECT {', '.join(select_expressions)} "
+                    f"FROM external({tableauhyperapi.escape_string_literal(parquet_file)})"
+                )
 
     WranglerLogger.info(f"Wrote {filename}")
\ No newline at end of file
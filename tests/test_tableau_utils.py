@@ -0,0 +1,43 @@
+"""Tests for create_baseyear_network/tableau_utils.py."""
+import pathlib
+import sys
+
+import geopandas as gpd
+import pytest
+import shapely
+
+tableauhyperapi = pytest.importorskip("tableauhyperapi")
+pytest.importorskip("network_wrangler")
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "create_baseyear_network"))
+import tableau_utils  # noqa: E402
+
+
+def read_hyper_table(filename, tablename):
+    """Returns the column names and rows of the given table in the given hyper file."""
+    with tableau_utils.start_hyper_process() as hyper:
+        with tableauhyperapi.Connection(endpoint=hyper.endpoint, database=filename) as connection:
+            table_name = tableauhyperapi.TableName(tablename)
+            table_def = connection.catalog.get_table_definition(table_name)
+            rows = connection.execute_list_query(f"SELECT COUNT(*) FROM {table_name}")
+    return [str(col.name.unescaped) for col in table_def.columns], rows[0][0]
+
+
+@pytest.mark.parametrize("geometry", [[], [None, shapely.LineString([(-122.4, 37.7), (-122.4, 37.7)])]],
+                         ids=["empty", "all_invalid"])
+def test_write_geodataframe_as_tableau_hyper_no_rows(tmp_path, geometry):
+    gdf = gpd.GeoDataFrame({
+        "model_link_id": list(range(len(geometry))),
+        "distance": [1.5] * len(geometry),
+        "drive_access": [True] * len(geometry),
+        "name": ["a"] * len(geometry),
+    }, geometry=geometry, crs="EPSG:4326")
+    # the object columns of an empty frame have no values to infer a type from
+    gdf = gdf.astype({"model_link_id": int, "distance": float, "drive_access": bool})
+
+    filename = tmp_path / "links.hyper"
+    tableau_utils.write_geodataframe_as_tableau_hyper(gdf, filename, "links")
+
+    column_names, row_count = read_hyper_table(filename, "links")
+    assert column_names == ["model_link_id", "distance", "drive_access", "name", "geometry"]
+    assert row_count == 0